@@ -50,6 +50,42 @@
 
 jtag_states = [s.value for s in St]
 
+# TAP controller state transitions: current state -> (next if TMS=0, TMS=1).
+transitions = {
+    # Intro "tree"
+    St.TEST_LOGIC_RESET: (St.RUN_TEST_IDLE, St.TEST_LOGIC_RESET),
+    St.RUN_TEST_IDLE: (St.RUN_TEST_IDLE, St.SELECT_DR_SCAN),
+
+    # DR "tree"
+    St.SELECT_DR_SCAN: (St.CAPTURE_DR, St.SELECT_IR_SCAN),
+    St.CAPTURE_DR: (St.SHIFT_DR, St.EXIT1_DR),
+    St.SHIFT_DR: (St.SHIFT_DR, St.EXIT1_DR),
+    St.EXIT1_DR: (St.PAUSE_DR, St.UPDATE_DR),
+    St.PAUSE_DR: (St.PAUSE_DR, St.EXIT2_DR),
+    St.EXIT2_DR: (St.SHIFT_DR, St.UPDATE_DR),
+    St.UPDATE_DR: (St.RUN_TEST_IDLE, St.SELECT_DR_SCAN),
+
+    # IR "tree"
+    St.SELECT_IR_SCAN: (St.CAPTURE_IR, St.TEST_LOGIC_RESET),
+    St.CAPTURE_IR: (St.SHIFT_IR, St.EXIT1_IR),
+    St.SHIFT_IR: (St.SHIFT_IR, St.EXIT1_IR),
+    St.EXIT1_IR: (St.PAUSE_IR, St.UPDATE_IR),
+    St.PAUSE_IR: (St.PAUSE_IR, St.EXIT2_IR),
+    St.EXIT2_IR: (St.SHIFT_IR, St.UPDATE_IR),
+    St.UPDATE_IR: (St.RUN_TEST_IDLE, St.SELECT_DR_SCAN),
+}
+
+# TDI/TDO bit annotations, indexed by the bit value.
+bit_anns_tdi = ([16, ['0']], [16, ['1']])
+bit_anns_tdo = ([17, ['0']], [17, ['1']])
+
+# Annotation class of each state (same order as in jtag_states).
+state_anns = {s: i for i, s in enumerate(St)}
+
+# States in which TDI/TDO bits are shifted, and the ones which end a shift.
+shift_states = (St.SHIFT_DR, St.EXIT1_DR, St.SHIFT_IR, St.EXIT1_IR)
+update_states = (St.UPDATE_DR, St.UPDATE_IR)
+
 class Decoder(srd.Decoder):
     api_version = 3
     id = 'jtag'
@@ -120,44 +156,7 @@ def putp_bs(self, data):
 
     def advance_state_machine(self, tms):
         self.oldstate = self.state
-
-        # Intro "tree"
-        if self.state == St.TEST_LOGIC_RESET:
-            self.state = St.TEST_LOGIC_RESET if (tms) else St.RUN_TEST_IDLE
-        elif self.state == St.RUN_TEST_IDLE:
-            self.state = St.SELECT_DR_SCAN if (tms) else St.RUN_TEST_IDLE
-
-        # DR "tree"
-        elif self.state == St.SELECT_DR_SCAN:
-            self.state = St.SELECT_IR_SCAN if (tms) else St.CAPTURE_DR
-        elif self.state == St.CAPTURE_DR:
-            self.state = St.EXIT1_DR if (tms) else St.SHIFT_DR
-        elif self.state == St.SHIFT_DR:
-            self.state = St.EXIT1_DR if (tms) else St.SHIFT_DR
-        elif self.state == St.EXIT1_DR:
-            self.state = St.UPDATE_DR if (tms) else St.PAUSE_DR
-        elif self.state == St.PAUSE_DR:
-            self.state = St.EXIT2_DR if (tms) else St.PAUSE_DR
-        elif self.state == St.EXIT2_DR:
-            self.state = St.UPDATE_DR if (tms) else St.SHIFT_DR
-        elif self.state == St.UPDATE_DR:
-            self.state = St.SELECT_DR_SCAN if (tms) else St.RUN_TEST_IDLE
-
-        # IR "tree"
-        elif self.state == St.SELECT_IR_SCAN:
-            self.state = St.TEST_LOGIC_RESET if (tms) else St.CAPTURE_IR
-        elif self.state == St.CAPTURE_IR:
-            self.state = St.EXIT1_IR if (tms) else St.SHIFT_IR
-        elif self.state == St.SHIFT_IR:
-            self.state = St.EXIT1_IR if (tms) else St.SHIFT_IR
-        elif self.state == St.EXIT1_IR:
-            self.state = St.UPDATE_IR if (tms) else St.PAUSE_IR
-        elif self.state == St.PAUSE_IR:
-            self.state = St.EXIT2_IR if (tms) else St.PAUSE_IR
-        elif self.state == St.EXIT2_IR:
-            self.state = St.UPDATE_IR if (tms) else St.SHIFT_IR
-        elif self.state == St.UPDATE_IR:
-            self.state = St.SELECT_DR_SCAN if (tms) else St.RUN_TEST_IDLE
+        self.state = transitions[self.state][tms]
 
     def handle_rising_tck_edge(self, pins):
         (tdi, tdo, tck, tms, trst, srst, rtck) = pins
@@ -173,18 +172,17 @@ def handle_rising_tck_edge(self, pins):
             # Output the saved item (from the last CLK edge to the current).
             self.es_item = self.samplenum
             # Output the old state (from last rising TCK edge to current one).
-            self.putx([jtag_states.index(self.oldstate.value), [self.oldstate.value]])
+            self.putx([state_anns[self.oldstate], [self.oldstate.value]])
             self.putp(['NEW STATE', self.state.value])
 
         # Upon SHIFT-*/EXIT1-* collect the current TDI/TDO values.
-        if self.oldstate.value.startswith('SHIFT-') or \
-           self.oldstate.value.startswith('EXIT1-'):
+        if self.oldstate in shift_states:
             if self.first_bit:
                 self.ss_bitstring = self.samplenum
                 self.first_bit = False
             else:
-                self.putx([16, [str(self.bits_tdi[-1])]])
-                self.putx([17, [str(self.bits_tdo[-1])]])
+                self.putx(bit_anns_tdi[self.bits_tdi[-1]])
+                self.putx(bit_anns_tdo[self.bits_tdo[-1]])
                 # Use self.samplenum as ES of the previous bit.
                 self.bits_samplenums_tdi[-1][1] = self.samplenum
                 self.bits_samplenums_tdo[-1][1] = self.samplenum
@@ -197,7 +195,7 @@ def handle_rising_tck_edge(self, pins):
             self.bits_samplenums_tdo.append([self.samplenum, -1])
 
         # Output all TDI/TDO bits if we just switched to UPDATE-*.
-        if self.state.value.startswith('UPDATE-'):
+        if self.state in update_states:
 
             self.es_bitstring = self.samplenum
 
@@ -205,8 +203,7 @@ def handle_rising_tck_edge(self, pins):
             self.bits_tdi.reverse()
             self.bits_samplenums_tdi.reverse()
             b = ''.join(map(str, self.bits_tdi[1:]))
-            h = ' (0x%x' % int('0b0' + b, 2) + ')'
-            s = t + ': ' + b + h + ', ' + str(len(self.bits_tdi[1:])) + ' bits'
+            s = '%s: %s (0x%x), %d bits' % (t, b, int('0' + b, 2), len(b))
             self.putx_bs([18, [s]])
             self.putp_bs([t, [b, self.bits_samplenums_tdi[1:]]])
             self.bits_tdi = []
@@ -216,8 +213,7 @@ def handle_rising_tck_edge(self, pins):
             self.bits_tdo.reverse()
             self.bits_samplenums_tdo.reverse()
             b = ''.join(map(str, self.bits_tdo[1:]))
-            h = ' (0x%x' % int('0b0' + b, 2) + ')'
-            s = t + ': ' + b + h + ', ' + str(len(self.bits_tdo[1:])) + ' bits'
+            s = '%s: %s (0x%x), %d bits' % (t, b, int('0' + b, 2), len(b))
             self.putx_bs([19, [s]])
             self.putp_bs([t, [b, self.bits_samplenums_tdo[1:]]])
             self.bits_tdo = []
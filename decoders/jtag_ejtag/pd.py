@@ -398,11 +398,12 @@ def decode(self, ss: int, es: int, data):
         cmd, val = data
         self.ss, self.es = ss, es
 
-        if cmd == 'IR TDI':
+        # 'NEW STATE' is sent for every TCK cycle, so check it first.
+        if cmd == 'NEW STATE':
+            self.handle_new_state(val)
+        elif cmd == 'IR TDI':
             self.handle_ir_tdi(val)
         elif cmd == 'DR TDI':
             self.handle_dr_tdi(val)
         elif cmd == 'DR TDO':
             self.handle_dr_tdo(val)
-        elif cmd == 'NEW STATE':
-            self.handle_new_state(val)
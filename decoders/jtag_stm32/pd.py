@@ -31,6 +31,17 @@
     '1000': ['ABORT', 35],  # Abort register # TODO: 32 bits? Datasheet typo?
 }
 
+# DR items each register is interested in (incoming bits = TDI, outgoing
+# bits = TDO). The register access is complete after the last one.
+reg_items = {
+    'BYPASS': ('DR TDI',),
+    'IDCODE': ('DR TDO',),
+    'DPACC': ('DR TDI', 'DR TDO'),
+    'APACC': ('DR TDI', 'DR TDO'),
+    'ABORT': ('DR TDO',),
+    'UNKNOWN': ('DR TDO',),
+}
+
 # Boundary scan data registers (in IR[8:4]) and their sizes (in bits)
 bs_ir = {
     '11111': ['BYPASS', 1], # Bypass register
@@ -68,16 +79,16 @@
 
 # ACK[2:0] in the DPACC/APACC registers (unlisted values are reserved)
 ack_val = {
-    '001': 'WAIT',
-    '010': 'OK/FAULT',
+    0b001: 'WAIT',
+    0b010: 'OK/FAULT',
 }
 
 # 32bit debug port registers (addressed via A[3:2])
 dp_reg = {
-    '00': 'Reserved', # Must be kept at reset value
-    '01': 'DP CTRL/STAT',
-    '10': 'DP SELECT',
-    '11': 'DP RDBUFF',
+    0b00: 'Reserved', # Must be kept at reset value
+    0b01: 'DP CTRL/STAT',
+    0b10: 'DP SELECT',
+    0b11: 'DP RDBUFF',
 }
 
 # APB-AP registers (each of them 32 bits wide)
@@ -105,12 +116,12 @@
 #              Bits[11:8]: Continuation code ('ARM Ltd.': 0x04)
 #              Bits[7:1]: Identity code ('ARM Ltd.': 0x3b)
 # Bits[0:0]:   Reserved (here: 0x1)
-def decode_device_id_code(bits):
-    id_hex = '0x%x' % int('0b' + bits, 2)
-    ver = cm3_idcode_ver.get(int('0b' + bits[-32:-28], 2), 'UNKNOWN')
-    part = cm3_idcode_part.get(int('0b' + bits[-28:-12], 2), 'UNKNOWN')
-    ids = jedec_id.get(int('0b' + bits[-12:-8], 2) + 1, {})
-    manuf = ids.get(int('0b' + bits[-7:-1], 2), 'UNKNOWN')
+def decode_device_id_code(idcode):
+    id_hex = '0x%x' % idcode
+    ver = cm3_idcode_ver.get((idcode >> 28) & 0xf, 'UNKNOWN')
+    part = cm3_idcode_part.get((idcode >> 12) & 0xffff, 'UNKNOWN')
+    ids = jedec_id.get(((idcode >> 8) & 0xf) + 1, {})
+    manuf = ids.get((idcode >> 1) & 0x7f, 'UNKNOWN')
     return (id_hex, manuf, ver, part)
 
 # DPACC is used to access debug port registers (CTRL/STAT, SELECT, RDBUFF).
@@ -121,19 +132,21 @@ def decode_device_id_code(bits):
 # Bits[2:1] = A[3:2]: 2-bit address (debug/access port register)
 # Bits[0:0] = RnW: Read request (1) or write request (0)
 def data_in(instruction, bits):
-    data, a, rnw = bits[:-3], bits[-3:-1], bits[-1]
-    data_hex = '0x%x' % int('0b' + data, 2)
-    r = 'Read request' if (rnw == '1') else 'Write request'
-    # reg = dp_reg[a] if (instruction == 'DPACC') else apb_ap_reg[a]
-    reg = dp_reg[a] if (instruction == 'DPACC') else a # TODO
+    val = int('0b' + bits, 2)
+    data, a, rnw = val >> 3, (val >> 1) & 0x3, val & 0x1
+    data_hex = '0x%x' % data
+    r = 'Read request' if (rnw == 1) else 'Write request'
+    # reg = dp_reg[a] if (instruction == 'DPACC') else apb_ap_reg[a << 2]
+    reg = dp_reg[a] if (instruction == 'DPACC') else '{:02b}'.format(a) # TODO
     return 'New transaction: DATA: %s, A: %s, RnW: %s' % (data_hex, reg, r)
 
 # APACC/DPACC, when transferring data OUT:
 # Bits[34:3] = DATA[31:0]: 32bit data which is read (read request)
 # Bits[2:0] = ACK[2:0]: 3-bit acknowledge
 def data_out(bits):
-    data, ack = bits[:-3], bits[-3:]
-    data_hex = '0x%x' % int('0b' + data, 2)
+    val = int('0b' + bits, 2)
+    data, ack = val >> 3, val & 0x7
+    data_hex = '0x%x' % data
     ack_meaning = ack_val.get(ack, 'Reserved')
     return 'Previous transaction result: DATA: %s, ACK: %s' \
            % (data_hex, ack_meaning)
@@ -166,6 +179,7 @@ def __init__(self):
 
     def reset(self):
         self.state = 'IDLE'
+        self.handle_reg = None
         self.samplenums = None
 
     def start(self):
@@ -183,9 +197,10 @@ def handle_reg_bypass(self, cmd, bits):
     def handle_reg_idcode(self, cmd, bits):
         bits = bits[1:]
 
-        id_hex, manuf, ver, part = decode_device_id_code(bits)
-        cc = '0x%x' % int('0b' + bits[-12:-8], 2)
-        ic = '0x%x' % int('0b' + bits[-7:-1], 2)
+        idcode = int('0b' + bits, 2)
+        id_hex, manuf, ver, part = decode_device_id_code(idcode)
+        cc = '0x%x' % ((idcode >> 8) & 0xf)
+        ic = '0x%x' % ((idcode >> 1) & 0x7f)
 
         self.putf(0, 0, [1, ['Reserved', 'Res', 'R']])
         self.putf(8, 11, [0, ['Continuation code: %s' % cc, 'CC', 'C']])
@@ -195,8 +210,7 @@ def handle_reg_idcode(self, cmd, bits):
         self.putf(28, 31, [1, ['Version: %s' % ver, 'Version', 'V']])
         self.putf(32, 32, [1, ['BYPASS (BS TAP)', 'BS', 'B']])
 
-        self.putx([2, ['IDCODE: %s (%s: %s/%s)' % \
-                  decode_device_id_code(bits)]])
+        self.putx([2, ['IDCODE: %s (%s: %s/%s)' % (id_hex, manuf, ver, part)]])
 
     def handle_reg_dpacc(self, cmd, bits):
         bits = bits[1:]
@@ -228,10 +242,13 @@ def decode(self, ss, es, data):
 
         self.ss, self.es = ss, es
 
-        if cmd != 'NEW STATE':
-            # The right-most char in the 'val' bitstring is the LSB.
-            val, self.samplenums = val
-            self.samplenums.reverse()
+        # TAP state changes (the bulk of the items) don't affect any register.
+        if cmd == 'NEW STATE':
+            return
+
+        # The right-most char in the 'val' bitstring is the LSB.
+        val, samplenums = val
+        self.samplenums = samplenums[::-1]
 
         if cmd == 'IR TDI':
             # Switch to the state named after the instruction, or 'UNKNOWN'.
@@ -239,31 +256,16 @@ def decode(self, ss, es, data):
             # boundary scan tap (5 bits) and the Cortex-M3 TAP (4 bits).
             # See UM 31.5 "STM32F10xxx JTAG TAP connection" for details.
             self.state = ir.get(val[5:9], ['UNKNOWN', 0])[0]
+            self.handle_reg = getattr(self, 'handle_reg_%s' % self.state.lower())
             bstap_ir = bs_ir.get(val[:5], ['UNKNOWN', 0])[0]
             self.putf(4, 8, [1, ['IR (BS TAP): ' + bstap_ir]])
             self.putf(0, 3, [1, ['IR (M3 TAP): ' + self.state]])
             self.putx([2, ['IR: %s' % self.state]])
 
         # State machine
-        if self.state == 'BYPASS':
-            # Here we're interested in incoming bits (TDI).
-            if cmd != 'DR TDI':
-                return
-            handle_reg = getattr(self, 'handle_reg_%s' % self.state.lower())
-            handle_reg(cmd, val)
-            self.state = 'IDLE'
-        elif self.state in ('IDCODE', 'ABORT', 'UNKNOWN'):
-            # Here we're interested in outgoing bits (TDO).
-            if cmd != 'DR TDO':
-                return
-            handle_reg = getattr(self, 'handle_reg_%s' % self.state.lower())
-            handle_reg(cmd, val)
+        items = reg_items.get(self.state)
+        if items is None or cmd not in items:
+            return
+        self.handle_reg(cmd, val)
+        if cmd == items[-1]: # Assumes 'DR TDI' comes before 'DR TDO'.
             self.state = 'IDLE'
-        elif self.state in ('DPACC', 'APACC'):
-            # Here we're interested in incoming and outgoing bits (TDI/TDO).
-            if cmd not in ('DR TDI', 'DR TDO'):
-                return
-            handle_reg = getattr(self, 'handle_reg_%s' % self.state.lower())
-            handle_reg(cmd, val)
-            if cmd == 'DR TDO': # Assumes 'DR TDI' comes before 'DR TDO'.
-                self.state = 'IDLE'
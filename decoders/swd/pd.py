@@ -18,7 +18,6 @@
 ##
 
 import sigrokdecode as srd
-import re
 
 '''
 OUTPUT_PYTHON format:
@@ -46,10 +45,27 @@
     'DPARITY', # Data parity phase
 ]
 
-# Regexes for matching SWD data out of bitstring ('1' / '0' characters) format
-RE_SWDSWITCH = re.compile(bin(0xE79E)[:1:-1] + '$')
-RE_SWDREQ = re.compile(r'1(?P<apdp>.)(?P<rw>.)(?P<addr>..)(?P<parity>.)01$')
-RE_IDLE = re.compile('0' * 50 + '$')
+# JTAG->SWD select sequence (transmitted LSB first)
+SWD_SWITCH = 0xE79E
+
+# SWD request packet bits (transmitted LSB first, bit 5 is the parity bit)
+REQ_START = (1 << 0)
+REQ_APNDP = (1 << 1)
+REQ_RNW = (1 << 2)
+REQ_ADDR = (3 << 3) # A[3:2]
+REQ_STOP = (1 << 6)
+REQ_PARK = (1 << 7)
+
+def decode_request(req):
+    '''Return (rw, apdp, addr) for a valid request byte, or None.'''
+    if (req & (REQ_START | REQ_STOP | REQ_PARK)) != (REQ_START | REQ_PARK):
+        return None
+    rw = 'R' if (req & REQ_RNW) else 'W'
+    apdp = 'AP' if (req & REQ_APNDP) else 'DP'
+    return (rw, apdp, (req & REQ_ADDR) >> 1)
+
+# Decoded request for each possible request byte.
+REQUESTS = [decode_request(req) for req in range(256)]
 
 # Sample edges
 RISING = 1
@@ -61,7 +77,37 @@
 BIT_SELECT_CTRLSEL = 1
 BIT_CTRLSTAT_ORUNDETECT = 1
 
+# OUTPUT_PYTHON packet types, indexed by (apdp, rw).
+PTYPES = {
+    ('AP', 'R'): 'AP_READ',
+    ('AP', 'W'): 'AP_WRITE',
+    ('DP', 'R'): 'DP_READ',
+    ('DP', 'W'): 'DP_WRITE',
+}
+
+# DP register names, indexed by (rw, addr), then by the SELECT.CTRLSEL bit.
+# Tables 2-4 & 2-5 in ADIv5.2 spec ARM document IHI 0031C
+DP_REGS = {
+    ('R', 0x0): ('IDCODE', 'IDCODE'),
+    ('R', 0x4): ('R CTRL/STAT', 'R DLCR'),
+    ('R', 0x8): ('RESEND', 'RESEND'),
+    ('R', 0xC): ('RDBUFF', 'RDBUFF'),
+    ('W', 0x0): ('W ABORT', 'W ABORT'),
+    ('W', 0x4): ('W CTRL/STAT', 'W DLCR'),
+    ('W', 0x8): ('W SELECT', 'W SELECT'),
+    ('W', 0xC): ('W RESERVED', 'W RESERVED'),
+}
+
+# ACK bits, in the order they are received.
+ACKS = {
+    '100': 'OK',
+    '010': 'WAIT',
+    '001': 'FAULT',
+    '111': 'NOREPLY',
+}
+
 ANNOTATIONS = ['reset', 'enable', 'read', 'write', 'ack', 'data', 'parity']
+ANN_INDEX = {a: i for i, a in enumerate(ANNOTATIONS)}
 
 class Decoder(srd.Decoder):
     api_version = 3
@@ -103,6 +149,7 @@ def reset(self):
         self.ss_req = 0 # Start sample of current req
         self.turnaround = 0 # Number of turnaround edges to ignore before continuing
         self.bits = '' # Bits from SWDIO are accumulated here, matched against expected sequences
+        self.shiftreg = 0 # The last 16 bits from SWDIO, the most recent one in bit 15
         self.samplenums = [] # Sample numbers that correspond to the samples in self.bits
         self.linereset_count = 0
 
@@ -113,6 +160,15 @@ def reset(self):
         self.ctrlsel = 0 # 'ctrlsel' is bit 0 in the SELECT register.
         self.orundetect = 0 # 'orundetect' is bit 0 in the CTRLSTAT register.
 
+        # Clock edge handlers, indexed by SWD state
+        self.handle_edge = {
+            'UNKNOWN': self.handle_unknown_edge,
+            'REQ': self.handle_req_edge,
+            'ACK': self.handle_ack_edge,
+            'DATA': self.handle_data_edge,
+            'DPARITY': self.handle_dparity_edge,
+        }
+
     def start(self):
         self.out_ann = self.register(srd.OUTPUT_ANN)
         self.out_python = self.register(srd.OUTPUT_PYTHON)
@@ -121,7 +177,7 @@ def start(self):
 
     def putx(self, ann, length, data):
         '''Output annotated data.'''
-        ann = ANNOTATIONS.index(ann)
+        ann = ANN_INDEX[ann]
         try:
             ss = self.samplenums[-length]
         except IndexError:
@@ -136,18 +192,17 @@ def putp(self, ptype, pdata):
 
     def put_python_data(self):
         '''Emit Python data item based on current SWD packet contents.'''
-        ptype = {
-            ('AP', 'R'): 'AP_READ',
-            ('AP', 'W'): 'AP_WRITE',
-            ('DP', 'R'): 'DP_READ',
-            ('DP', 'W'): 'DP_WRITE',
-        }[(self.apdp, self.rw)]
+        ptype = PTYPES[(self.apdp, self.rw)]
         self.putp(ptype, (self.addr, self.data, self.ack))
 
     def decode(self):
         while True:
-            # Wait for any clock edge.
-            clk, dio = self.wait({0: 'e'})
+            # Wait for the next clock edge. Line resets are counted on rising
+            # edges, so falling edges only matter if data is sampled on them.
+            if self.sample_edge == RISING:
+                clk, dio = self.wait({0: 'r'})
+            else:
+                clk, dio = self.wait({0: 'e'})
 
             # Count rising edges with DIO held high,
             # as a line reset (50+ high edges) can happen from any state.
@@ -173,13 +228,8 @@ def decode(self):
 
             self.bits += str(dio)
             self.samplenums.append(self.samplenum)
-            {
-                'UNKNOWN': self.handle_unknown_edge,
-                'REQ': self.handle_req_edge,
-                'ACK': self.handle_ack_edge,
-                'DATA': self.handle_data_edge,
-                'DPARITY': self.handle_dparity_edge,
-            }[self.state]()
+            self.shiftreg = (self.shiftreg >> 1) | (dio << 15)
+            self.handle_edge[self.state]()
 
     def next_state(self):
         '''Step to the next SWD state, reset internal counters accordingly.'''
@@ -208,7 +258,8 @@ def next_state(self):
 
     def reset_state(self):
         '''Line reset (or equivalent), wait for a new pending SWD request.'''
-        if self.state != 'REQ': # Emit a Python data item.
+        # Emit a Python data item, unless no request was seen yet.
+        if self.state not in ('UNKNOWN', 'REQ'):
             self.put_python_data()
         # Clear state.
         self.bits = ''
@@ -230,21 +281,22 @@ def handle_unknown_edge(self):
 
     def handle_req_edge(self):
         '''Clock edge in the REQ state (waiting for SWD r/w request).'''
+        # Only the last 16 bits can be part of the sequences matched here,
+        # older sample numbers are just kept to annotate a line reset.
+        if len(self.bits) > 16:
+            self.bits = self.bits[-16:]
+            del self.samplenums[:-max(16, self.linereset_count)]
+
         # Check for a JTAG->SWD enable sequence.
-        m = re.search(RE_SWDSWITCH, self.bits)
-        if m is not None:
+        if len(self.bits) == 16 and self.shiftreg == SWD_SWITCH:
             self.putx('enable', 16, 'JTAG->SWD')
             self.reset_state()
             return
 
         # Or a valid SWD Request packet.
-        m = re.search(RE_SWDREQ, self.bits)
-        if m is not None:
-            calc_parity = sum([int(x) for x in m.group('rw') + m.group('apdp') + m.group('addr')]) % 2
-            parity = '' if str(calc_parity) == m.group('parity') else 'E'
-            self.rw = 'R' if m.group('rw') == '1' else 'W'
-            self.apdp = 'AP' if m.group('apdp') == '1' else 'DP'
-            self.addr = int(m.group('addr')[::-1], 2) << 2
+        req = REQUESTS[self.shiftreg >> 8]
+        if len(self.bits) >= 8 and req is not None:
+            self.rw, self.apdp, self.addr = req
             self.putx('read' if self.rw == 'R' else 'write', 8, self.get_address_description())
             self.next_state()
             return
@@ -253,46 +305,26 @@ def handle_ack_edge(self):
         '''Clock edge in the ACK state (waiting for complete ACK sequence).'''
         if len(self.bits) < 3:
             return
-        if self.bits == '100':
-            self.putx('ack', 3, 'OK')
-            self.ack = 'OK'
+        self.ack = ACKS.get(self.bits, 'ERROR')
+        self.putx('ack', 3, self.ack)
+        if self.ack == 'OK':
             self.next_state()
-        elif self.bits == '001':
-            self.putx('ack', 3, 'FAULT')
-            self.ack = 'FAULT'
+        elif self.ack in ('FAULT', 'WAIT'):
             if self.orundetect == 1:
                 self.next_state()
             else:
                 self.reset_state()
             self.turnaround = 1
-        elif self.bits == '010':
-            self.putx('ack', 3, 'WAIT')
-            self.ack = 'WAIT'
-            if self.orundetect == 1:
-                self.next_state()
-            else:
-                self.reset_state()
-            self.turnaround = 1
-        elif self.bits == '111':
-            self.putx('ack', 3, 'NOREPLY')
-            self.ack = 'NOREPLY'
-            self.reset_state()
         else:
-            self.putx('ack', 3, 'ERROR')
-            self.ack = 'ERROR'
             self.reset_state()
 
     def handle_data_edge(self):
         '''Clock edge in the DATA state (waiting for 32 bits to clock past).'''
         if len(self.bits) < 32:
             return
-        self.data = 0
-        self.dparity = 0
-        for x in range(32):
-            if self.bits[x] == '1':
-                self.data += (1 << x)
-                self.dparity += 1
-        self.dparity = self.dparity % 2
+        # Data is sent LSB first.
+        self.data = int(self.bits[::-1], 2)
+        self.dparity = self.bits.count('1') % 2
 
         self.putx('data', 32, '0x%08x' % self.data)
         self.next_state()
@@ -323,22 +355,9 @@ def get_address_description(self):
         for annotated results.
         '''
         if self.apdp == 'DP':
-            if self.rw == 'R':
-                # Tables 2-4 & 2-5 in ADIv5.2 spec ARM document IHI 0031C
-                return {
-                    0: 'IDCODE',
-                    0x4: 'R CTRL/STAT' if self.ctrlsel == 0 else 'R DLCR',
-                    0x8: 'RESEND',
-                    0xC: 'RDBUFF'
-                }[self.addr]
-            elif self.rw == 'W':
-                # Tables 2-4 & 2-5 in ADIv5.2 spec ARM document IHI 0031C
-                return {
-                    0: 'W ABORT',
-                    0x4: 'W CTRL/STAT' if self.ctrlsel == 0 else 'W DLCR',
-                    0x8: 'W SELECT',
-                    0xC: 'W RESERVED'
-                }[self.addr]
+            names = DP_REGS.get((self.rw, self.addr))
+            if names is not None:
+                return names[self.ctrlsel]
         elif self.apdp == 'AP':
             if self.rw == 'R':
                 return 'R AP%x' % self.addr